@@ -0,0 +1,28 @@
+'''
+This script converts the two-column (Date, GDPC1) .csv data files in the data
+directory into .parquet files with the same names. The read_usgdp_file()
+function in usgdp_npp_bokeh.py reads the .parquet version of a data file in
+preference to the .csv version when it exists.
+
+Run this script from any directory as:
+    python scripts/build_parquet.py
+'''
+# Import packages
+import glob
+import os
+import pandas as pd
+
+# Name the data directory relative to this script
+cur_path = os.path.split(os.path.abspath(__file__))[0]
+data_dir = os.path.join(cur_path, '..', 'data')
+
+for csv_path in sorted(glob.glob(os.path.join(data_dir, 'usgdp_*.csv'))):
+    # Skip the normalized peak output files, which are not two-column data
+    if os.path.basename(csv_path).startswith('usgdp_pk_'):
+        continue
+    data_df = pd.read_csv(csv_path, names=['Date', 'GDPC1'], skiprows=1,
+                          na_values=['.', 'na', 'NaN'], engine='pyarrow')
+    data_df['Date'] = pd.to_datetime(data_df['Date'], format='%Y-%m-%d')
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    data_df.to_parquet(parquet_path, engine='pyarrow', index=False)
+    print('Saved', os.path.relpath(parquet_path))
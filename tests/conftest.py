@@ -0,0 +1,55 @@
+'''
+Shared fixtures for the tests of usgdp_npp_bokeh.py module
+'''
+
+import pytest
+import datetime as dt
+import requests_cache
+import usgdp_npp_bokeh as usgdp
+
+
+@pytest.fixture(scope='session')
+def fred_http_cache(request, tmp_path_factory):
+    '''
+    Replaces the module's HTTP session with one that caches the responses
+    from FRED in a SQLite database in the pytest cache directory for one hour,
+    so repeated downloads of the same URL during and across test sessions are
+    read from disk. If the pytest cache is disabled, the database is kept in
+    a temporary directory for this session only.
+    '''
+    if getattr(request.config, 'cache', None) is not None:
+        cache_dir = request.config.cache.mkdir('fred_http')
+    else:
+        cache_dir = tmp_path_factory.mktemp('fred_http')
+    session = requests_cache.CachedSession(str(cache_dir / 'http_cache'),
+                                           expire_after=3600)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(usgdp, '_SESSION', session)
+        yield
+    session.close()
+
+
+@pytest.fixture(scope='session')
+def usgdp_data(fred_http_cache):
+    '''
+    Session-scoped cache of get_usgdp_data() output. Returns a function that
+    calls get_usgdp_data() only the first time it sees a given combination of
+    arguments, so the parametrized tests download and read the GDPC1 data
+    once per session rather than once per test. The downloads go through the
+    fred_http_cache session.
+    '''
+    cache = {}
+
+    def get_data(frwd_qtrs_max, bkwd_qtrs_max, usgdp_end_date,
+                 download_from_internet):
+        if usgdp_end_date == 'today':
+            end_date_str = dt.date.today().strftime('%Y-%m-%d')
+        else:
+            end_date_str = usgdp_end_date
+        key = (frwd_qtrs_max, bkwd_qtrs_max, end_date_str,
+               download_from_internet)
+        if key not in cache:
+            cache[key] = usgdp.get_usgdp_data(*key)
+        return cache[key]
+
+    return get_data
@@ -1,5 +1,5 @@
 '''
-Tests of usgdp_npp_bokey.py module
+Tests of usgdp_npp_bokeh.py module
 
 Three main tests:
 * make sure that running the module as a script python usgdp_npp_bokeh.py
@@ -10,7 +10,13 @@ Three main tests:
 '''
 
 import pytest
+import re
 import datetime as dt
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
 # import os
 # import pathlib
 # import runpy
@@ -18,13 +24,14 @@ import usgdp_npp_bokeh as usgdp
 
 
 # Create function to validate datetime text
+_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
 
 
 def validate(date_text):
+    if not _DATE_RE.fullmatch(date_text):
+        return False
     try:
-        if date_text != dt.datetime.strptime(
-                            date_text, "%Y-%m-%d").strftime('%Y-%m-%d'):
-            raise ValueError
+        dt.date.fromisoformat(date_text)
         return True
     except ValueError:
         return False
@@ -34,35 +41,149 @@ def validate(date_text):
 # two datasets
 # def test_html_fig_script():
 #     script = pathlib.Path(__file__, '..',
-#                           'scripts').resolve().glob('usempl_npp_bokeh.py')
+#                           'scripts').resolve().glob('usgdp_npp_bokeh.py')
 #     runpy.run_path(script)
 #     assert fig
 
-# Test that usempl_npp() function returns html figure and valid string and
+# Test that usgdp_npp() function returns html figure and valid string and
 # saves html figure file and two csv files.
-@pytest.mark.parametrize('frwd_qtrs_main', [10])
-@pytest.mark.parametrize('bkwd_qtrs_main', [3])
-@pytest.mark.parametrize('frwd_qtrs_max', [40])
-@pytest.mark.parametrize('bkwd_qtrs_max', [12])
-@pytest.mark.parametrize('usgdp_end_date', ['today', '2020-04-01'])
-@pytest.mark.parametrize('download_from_internet', [True, False])
-@pytest.mark.parametrize('html_show', [False])
-def test_html_fig(frwd_qtrs_main, bkwd_qtrs_main, frwd_qtrs_max, bkwd_qtrs_max,
-                  usgdp_end_date, download_from_internet, html_show):
-    # The case when usgdp_end_date == 'today' and download_from_internet ==
-    # False must be skipped because we don't have the data saved for every date
-    if usgdp_end_date == 'today' and not download_from_internet:
-        pytest.skip('Invalid case')
-        assert True
-    else:
-        fig, end_date_str = usgdp.usgdp_npp(
-            frwd_qtrs_main=frwd_qtrs_main, bkwd_qtrs_main=bkwd_qtrs_main,
-            frwd_qtrs_max=frwd_qtrs_max, bkwd_qtrs_max=bkwd_qtrs_max,
-            usgdp_end_date=usgdp_end_date,
-            download_from_internet=download_from_internet,
-            html_show=html_show)
-        assert fig
-        assert validate(end_date_str)
+# The cases with download_from_internet == False read the 2021-01-01 data
+# saved in the data directory, because we don't have the data saved for every
+# date and the files a download case saves may not exist yet when the tests
+# run in parallel. The case with test_mode == False builds the full figure,
+# with its hover tools and HTML output settings
+@pytest.mark.parametrize('usgdp_end_date,download_from_internet,test_mode',
+                         [('today', True, True), ('2020-04-01', True, True),
+                          ('2021-01-01', False, True),
+                          ('2021-01-01', False, False)])
+def test_html_fig(usgdp_end_date, download_from_internet, test_mode,
+                  usgdp_data):
+    precomputed = usgdp_data(40, 12, usgdp_end_date, download_from_internet)
+    fig, end_date_str = usgdp.usgdp_npp(
+        frwd_qtrs_main=10, bkwd_qtrs_main=3, frwd_qtrs_max=40,
+        bkwd_qtrs_max=12, usgdp_end_date=usgdp_end_date,
+        download_from_internet=download_from_internet, html_show=False,
+        precomputed=precomputed, test_mode=test_mode)
+    assert fig
+    assert validate(end_date_str)
     # assert html file exists
-    # assert usempl series csv file exists
-    # assert usempl ColumnDataSource source DataFrame csv file exists
+    # assert usgdp series csv file exists
+    # assert usgdp ColumnDataSource source DataFrame csv file exists
+
+
+# Test that fill_cubic_spline() reproduces a cubic polynomial exactly on
+# unevenly spaced knots, like the annual 1929-1946 knots with the final 2
+# quarter gap, and leaves the values outside the first and last knots missing
+def test_fill_cubic_spline_cubic():
+    x = np.arange(73, dtype=float)
+    cubic = 1000 + 25 * x - 0.6 * x ** 2 + 0.005 * x ** 3
+    knots = np.r_[np.arange(2, 70, 4), 70]
+    vals = np.full(73, np.nan)
+    vals[knots] = cubic[knots]
+    filled = usgdp.fill_cubic_spline(vals)
+    assert np.allclose(filled[2:71], cubic[2:71], rtol=0, atol=1e-9)
+    assert np.array_equal(filled[knots], vals[knots])
+    assert np.isnan(filled[[0, 1, 71, 72]]).all()
+
+
+# Test that fill_cubic_spline() matches pandas interpolate(method='cubic')
+def test_fill_cubic_spline_pandas():
+    pytest.importorskip('scipy')
+    rng = np.random.default_rng(0)
+    vals = rng.normal(1000, 50, 71)
+    vals[rng.random(71) < 0.7] = np.nan
+    vals[[0, 3, 9, 68, 70]] = [1000, 1010, 990, 1040, 1050]
+    expected = pd.Series(vals).interpolate(method='cubic').to_numpy()
+    assert np.allclose(usgdp.fill_cubic_spline(vals), expected, rtol=1e-12)
+
+
+# Test that read_usgdp_file() reads the .csv file, with missing values and
+# typed dates, and reads the .parquet file instead when one exists
+def test_read_usgdp_file(tmp_path):
+    csv_path = tmp_path / 'usgdp_2021-01-01.csv'
+    csv_path.write_text('Date,GDPC1\n1929-07-01,1109.448\n'
+                        '1929-10-01,.\n1930-01-01,1065.9\n')
+    csv_df = usgdp.read_usgdp_file(str(csv_path))
+    assert list(csv_df.columns) == ['Date', 'GDPC1']
+    assert pd.api.types.is_datetime64_any_dtype(csv_df['Date'])
+    assert csv_df['Date'].iloc[-1] == pd.Timestamp('1930-01-01')
+    assert csv_df['GDPC1'].isna().tolist() == [False, True, False]
+
+    parquet_df = csv_df.assign(GDPC1=csv_df['GDPC1'] * 2)
+    parquet_df.to_parquet(tmp_path / 'usgdp_2021-01-01.parquet', index=False)
+    pd.testing.assert_frame_equal(usgdp.read_usgdp_file(str(csv_path)),
+                                  parquet_df)
+
+
+class StubFredSession:
+    '''
+    Stands in for the module's HTTP session. Serves the given .csv text for
+    every request and records the query parameters of each request.
+    '''
+    def __init__(self, csv_text):
+        self.csv_text = csv_text
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append(params)
+        return StubFredResponse(self.csv_text)
+
+
+class StubFredResponse:
+    def __init__(self, csv_text):
+        self.content = csv_text.encode()
+
+    def raise_for_status(self):
+        pass
+
+
+# Test that get_fred_gdpc1() parses FRED's .csv format, with '.' as missing
+def test_get_fred_gdpc1(monkeypatch):
+    session = StubFredSession('observation_date,GDPC1\n2020-01-01,19010.848\n'
+                              '2020-04-01,.\n2020-07-01,18596.521\n')
+    monkeypatch.setattr(usgdp, '_SESSION', session)
+    fred_df = usgdp.get_fred_gdpc1('2020-01-01', '2020-07-01')
+    assert session.calls == [{'id': 'GDPC1', 'cosd': '2020-01-01',
+                              'coed': '2020-07-01'}]
+    assert list(fred_df.columns) == ['Date', 'GDPC1']
+    assert fred_df['Date'].tolist() == list(pd.date_range(
+        '2020-01-01', '2020-07-01', freq='QS'))
+    assert fred_df['GDPC1'].isna().tolist() == [False, True, False]
+
+
+# Test that get_usgdp_data() downloads the data for a requested end date only
+# once a day, logs the download, and clears the memoized local data after a
+# download. FRED is stubbed with the 1947-2020 data saved in the data
+# directory, and the data files are written to a temporary directory
+def test_get_usgdp_data_download_log(tmp_path, monkeypatch):
+    src_data_dir = os.path.join(os.path.dirname(usgdp.__file__), 'data')
+    usgdp._get_usgdp_data_local(40, 12, '2021-01-01')
+    assert usgdp._get_usgdp_data_local.cache_info().currsize > 0
+
+    (tmp_path / 'data').mkdir()
+    shutil.copy(os.path.join(src_data_dir, 'usgdp_annual_1929-1946.csv'),
+                tmp_path / 'data')
+    monkeypatch.setattr(usgdp, '__file__',
+                        str(tmp_path / 'usgdp_npp_bokeh.py'))
+    fred_df = pd.read_csv(os.path.join(src_data_dir, 'usgdp_2021-01-01.csv'))
+    fred_df = fred_df[fred_df['Date'] >= '1947-01-01']
+    session = StubFredSession(
+        fred_df.rename(columns={'Date': 'observation_date'}).to_csv(
+            index=False))
+    monkeypatch.setattr(usgdp, '_SESSION', session)
+
+    first = usgdp.get_usgdp_data(40, 12, '2021-03-15', True)
+    assert len(session.calls) == 1
+    assert first[1] == '2021-01-01'
+    with open(tmp_path / 'data' / 'usgdp_downloads.json') as file:
+        assert json.load(file) == {
+            '2021-03-15': [dt.date.today().strftime('%Y-%m-%d'),
+                           '2021-01-01']}
+    assert usgdp._get_usgdp_data_local.cache_info().currsize == 0
+    assert (tmp_path / 'data' / 'usgdp_2021-01-01.csv').is_file()
+    assert (tmp_path / 'data' / 'usgdp_pk_2021-01-01.parquet').is_file()
+
+    second = usgdp.get_usgdp_data(40, 12, '2021-03-15', True)
+    assert len(session.calls) == 1
+    assert second[1] == '2021-01-01'
+    pd.testing.assert_frame_equal(first[0], second[0])
@@ -8,26 +8,168 @@ creates a normalized peak plot of the GDPC1 data for each of the last 15
 recessions using the Bokeh plotting library.
 
 This module defines the following function(s):
+    read_usgdp_file()
+    get_fred_gdpc1()
+    fill_cubic_spline()
     get_usgdp_data()
     usgdp_npp()
 '''
 # Import packages
 import numpy as np
 import pandas as pd
-import pandas_datareader as pddr
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import datetime as dt
 import os
-from bokeh.io import output_file
-from bokeh.plotting import figure, show
-from bokeh.models import ColumnDataSource, Title, Legend, HoverTool
-# from bokeh.models import Label
-from bokeh.palettes import Category20
+import io
+import json
+import hashlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+# bokeh is slow to import, so it is imported inside the function that uses it
+
+# Reuse one HTTP session, and so its open connections, for every download
+# from FRED, and retry a download when the server returns a transient error
+_SESSION = requests.Session()
+_SESSION.mount('https://',
+               HTTPAdapter(pool_connections=4, pool_maxsize=4,
+                           max_retries=Retry(total=3, backoff_factor=0.5,
+                                             status_forcelist=[500, 502, 503,
+                                                               504])))
+
+# Recession-specific parameters of the last 15 recessions, which are the same
+# in every call, as immutable tuples
+_REC_LABEL_YR = ('1929-1933',  # (Aug 1929 - Mar 1933) Great Depression
+                 '1937-1938',  # (May 1937 - Jun 1938)
+                 '1945',       # (Feb 1945 - Oct 1945)
+                 '1948-1949',  # (Nov 1948 - Oct 1949)
+                 '1953-1954',  # (Jul 1953 - May 1954)
+                 '1957-1958',  # (Aug 1957 - Apr 1958)
+                 '1960-1961',  # (Apr 1960 - Feb 1961)
+                 '1969-1970',  # (Dec 1969 - Nov 1970)
+                 '1973-1975',  # (Nov 1973 - Mar 1975)
+                 '1980',       # (Jan 1980 - Jul 1980)
+                 '1981-1982',  # (Jul 1981 - Nov 1982)
+                 '1990-1991',  # (Jul 1990 - Mar 1991)
+                 '2001',       # (Mar 2001 - Nov 2001)
+                 '2007-2009',  # (Dec 2007 - Jun 2009) Great Recession
+                 '2020-pres')  # (Feb 2020 - present) Coronavirus recession
+
+_REC_LABEL_YRMTH = ('Aug 1929 - Mar 1933',  # Great Depression
+                    'May 1937 - Jun 1938',
+                    'Feb 1945 - Oct 1945',
+                    'Nov 1948 - Oct 1949',
+                    'Jul 1953 - May 1954',
+                    'Aug 1957 - Apr 1958',
+                    'Apr 1960 - Feb 1961',
+                    'Dec 1969 - Nov 1970',
+                    'Nov 1973 - Mar 1975',
+                    'Jan 1980 - Jul 1980',
+                    'Jul 1981 - Nov 1982',
+                    'Jul 1990 - Mar 1991',
+                    'Mar 2001 - Nov 2001',
+                    'Dec 2007 - Jun 2009',  # Great Recession
+                    'Feb 2020 - present')  # Coronavirus recession
+
+_REC_BEG_YRMTH = ('Aug 1929', 'May 1937', 'Feb 1945', 'Nov 1948', 'Jul 1953',
+                  'Aug 1957', 'Apr 1960', 'Dec 1969', 'Nov 1973', 'Jan 1980',
+                  'Jul 1981', 'Jul 1990', 'Mar 2001', 'Dec 2007', 'Feb 2020')
+
+_MAXDATE_RNG = (('1929-7-1', '1929-10-1'),
+                ('1937-4-1', '1937-10-1'),
+                ('1945-1-1', '1945-4-1'),
+                ('1948-7-1', '1949-1-1'),
+                ('1953-4-1', '1953-7-1'),
+                ('1957-7-1', '1957-10-1'),
+                ('1960-1-1', '1960-4-1'),
+                ('1969-7-1', '1970-1-1'),
+                ('1973-10-1', '1974-1-1'),
+                ('1979-10-1', '1980-4-1'),
+                ('1981-4-1', '1981-10-1'),
+                ('1990-4-1', '1991-10-1'),
+                ('2001-1-1', '2001-7-1'),
+                ('2007-7-1', '2008-1-1'),
+                ('2019-10-1', '2020-4-1'))
+# The string dates of the peak date ranges parsed into Timestamps once
+_MAXDATE_RNG_TS = tuple((pd.Timestamp(rng_beg), pd.Timestamp(rng_end))
+                        for rng_beg, rng_end in _MAXDATE_RNG)
 
 '''
 Define functions
 '''
 
 
+def read_usgdp_file(file_path):
+    '''
+    This function reads in a two-column (Date, GDPC1) data file from the data
+    directory. If a .parquet version of the file with the same name exists, it
+    reads that file, which is much faster to load than the .csv file because
+    its columns are already typed. Otherwise it reads the .csv file.
+
+    Args:
+        file_path (str): path of the .csv data file
+
+    Other functions and files called by this function:
+        [file_path].parquet or [file_path].csv
+
+    Files created by this function:
+        None
+
+    Returns:
+        data_df (DataFrame): N x 2 DataFrame of Date and GDPC1
+    '''
+    parquet_path = os.path.splitext(file_path)[0] + '.parquet'
+    if os.path.isfile(parquet_path):
+        data_df = pd.read_parquet(parquet_path)
+    else:
+        # Parse the file with the multithreaded PyArrow engine and the dates
+        # with an explicit format, which avoids pandas inferring the format of
+        # each date string
+        data_df = pd.read_csv(file_path, names=['Date', 'GDPC1'], skiprows=1,
+                              na_values=['.', 'na', 'NaN'], engine='pyarrow')
+        data_df['Date'] = pd.to_datetime(data_df['Date'], format='%Y-%m-%d')
+
+    return data_df
+
+
+def get_fred_gdpc1(start_date_str, end_date_str):
+    '''
+    This function downloads the U.S. real GDP seasonally adjusted quarterly
+    data series (GDPC1) as a .csv file directly from FRED's graph data
+    endpoint (requires internet connection).
+
+    Args:
+        start_date_str (str): start date of GDPC1 time series in 'YYYY-mm-dd'
+            format
+        end_date_str (str): end date of GDPC1 time series in 'YYYY-mm-dd'
+            format
+
+    Other functions and files called by this function:
+        https://fred.stlouisfed.org/graph/fredgraph.csv?id=GDPC1
+
+    Files created by this function:
+        None
+
+    Returns:
+        fred_df (DataFrame): N x 2 DataFrame of Date and GDPC1, sorted from
+            oldest to newest
+    '''
+    response = _SESSION.get('https://fred.stlouisfed.org/graph/fredgraph.csv',
+                            params={'id': 'GDPC1', 'cosd': start_date_str,
+                                    'coed': end_date_str},
+                            timeout=30)
+    response.raise_for_status()
+    fred_df = pd.read_csv(io.BytesIO(response.content),
+                          names=['Date', 'GDPC1'], skiprows=1,
+                          na_values=['.'], engine='pyarrow')
+    fred_df['Date'] = pd.to_datetime(fred_df['Date'], format='%Y-%m-%d')
+
+    return fred_df
+
+
 def get_usgdp_data(frwd_qtrs_max, bkwd_qtrs_max, end_date_str,
                    download_from_internet=True):
     '''
@@ -46,11 +188,17 @@ def get_usgdp_data(frwd_qtrs_max, bkwd_qtrs_max, end_date_str,
             fred.stlouisfed.org, otherwise read data in from local directory
 
     Other functions and files called by this function:
-        usgdp_[yyyy-mm-dd].csv
+        get_fred_gdpc1()
+        read_usgdp_file()
+        usgdp_[yyyy-mm-dd].parquet or usgdp_[yyyy-mm-dd].csv
+        usgdp_annual_1929-1946.parquet or usgdp_annual_1929-1946.csv
+        usgdp_downloads.json
 
     Files created by this function:
         usgdp_[yyyy-mm-dd].csv
-        usgdp_pk_[yyyy-mm-dd].csv
+        usgdp_[yyyy-mm-dd].parquet
+        usgdp_pk_[yyyy-mm-dd].parquet
+        usgdp_downloads.json
 
     Returns:
         usgdp_pk (DataFrame): N x 46 DataFrame of qtrs_frm_peak, Date{i},
@@ -61,23 +209,24 @@ def get_usgdp_data(frwd_qtrs_max, bkwd_qtrs_max, end_date_str,
             function if the final data for that day have not come out yet
             (usually 2 hours after markets close, 6:30pm EST), or if the
             end_date is one on which markets are closed (e.g. weekends and
-            holidays). In this latter case, the pandas_datareader library
-            chooses the most recent date for which we have DJIA data.
+            holidays). In this latter case, FRED returns the data through
+            the most recent date for which we have DJIA data.
         peak_vals (list): list of peak DJIA value at the beginning of each of
             the last 15 recessions
         peak_dates (list): list of string date (YYYY-mm-dd) of peak DJIA value
             at the beginning of each of the last 15 recessions
-        rec_label_yr_lst (list): list of string start year and end year of each
-            of the last 15 recessions
-        rec_label_yrmth_lst (list): list of string start year and month and end
-            year and month of each of the last 15 recessions
-        rec_beg_yrmth_lst (list): list of string start year and month of each
-            of the last 15 recessions
-        maxdate_rng_lst (list): list of tuples with start string date and end
-            string date within which range we define the peak DJIA value at the
-            beginning of each of the last 15 recessions
+        rec_label_yr_lst (tuple): tuple of string start year and end year of
+            each of the last 15 recessions
+        rec_label_yrmth_lst (tuple): tuple of string start year and month and
+            end year and month of each of the last 15 recessions
+        rec_beg_yrmth_lst (tuple): tuple of string start year and month of
+            each of the last 15 recessions
+        maxdate_rng_lst (tuple): tuple of tuples with start string date and
+            end string date within which range we define the peak DJIA value at
+            the beginning of each of the last 15 recessions. These four tuples
+            are module-level constants shared by every call
     '''
-    end_date = dt.datetime.strptime(end_date_str, '%Y-%m-%d')
+    end_date_str2 = end_date_str
 
     # Name the current directory and make sure it has a data folder
     cur_path = os.path.split(os.path.abspath(__file__))[0]
@@ -86,168 +235,229 @@ def get_usgdp_data(frwd_qtrs_max, bkwd_qtrs_max, end_date_str,
     if not os.access(data_dir, os.F_OK):
         os.makedirs(data_dir)
 
-    filename_basic = ('data/usgdp_' + end_date_str + '.csv')
-    filename_full = ('data/usgdp_pk_' + end_date_str + '.csv')
+    # Read the data from the local directory instead of downloading it again
+    # if the data for end_date_str were already downloaded today. The
+    # downloads log maps each requested end date to the date of its last
+    # download and the end date of the data file that download saved
+    downloads_path = os.path.join(data_dir, 'usgdp_downloads.json')
+    downloads = {}
+    if os.path.isfile(downloads_path):
+        with open(downloads_path) as file:
+            downloads = json.load(file)
+    today_str = dt.date.today().strftime('%Y-%m-%d')
+    if (download_from_internet and end_date_str in downloads and
+            downloads[end_date_str][0] == today_str and
+            os.path.isfile(os.path.join(
+                data_dir, 'usgdp_' + downloads[end_date_str][1] + '.csv'))):
+        download_from_internet = False
+        end_date_str2 = downloads[end_date_str][1]
 
     if download_from_internet:
         # Download the employment data directly from fred.stlouisfed.org
-        # (requires internet connection)
-        start_date = dt.datetime(1947, 1, 1)
-        usgdp_df = pddr.fred.FredReader(symbols='GDPC1', start=start_date,
-                                        end=end_date).read()
-        usgdp_df = pd.DataFrame(usgdp_df).sort_index()  # Sort old to new
-        usgdp_df = usgdp_df.reset_index(level=['DATE'])
-        usgdp_df = usgdp_df.rename(columns={'DATE': 'Date'})
+        # (requires internet connection). At the same time, read in U.S.
+        # annual real GDP (GDPCA, not seasonally adjusted, billions of 2012
+        # chained dollars, annual rate) 1929-1946. Earliest year from FRED for
+        # this series is 1929, so cannot do pre-recession. Date values for
+        # annual data are set to July 1 of that year.
+        ann_data_file_path = os.path.join(data_dir,
+                                          'usgdp_annual_1929-1946.csv')
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            fut_fred = executor.submit(get_fred_gdpc1, '1947-01-01',
+                                       end_date_str)
+            fut_annual = executor.submit(read_usgdp_file, ann_data_file_path)
+            usgdp_df = fut_fred.result()
+            usgdp_ann_df = fut_annual.result()
         end_date_str2 = usgdp_df['Date'].iloc[-1].strftime('%Y-%m-%d')
-        end_date = dt.datetime.strptime(end_date_str2, '%Y-%m-%d')
-        filename_basic = ('data/usgdp_' + end_date_str2 + '.csv')
-        filename_full = ('data/usgdp_pk_' + end_date_str2 + '.csv')
-        usgdp_df.to_csv(filename_basic, index=False)
-        # Merge in U.S. annual real GDP (GDPCA, not seasonally adjusted,
-        # billions of 2012 chained dollars, annual rate) 1929-1946. Earliest
-        # year from FRED for this series is 1929, so cannot do pre-recession.
-        # Date values for annual data are set to July 1 of that year.
-        filename_annual = ('data/usgdp_annual_1929-1946.csv')
-        ann_data_file_path = os.path.join(cur_path, filename_annual)
-        usgdp_ann_df = \
-            pd.read_csv(ann_data_file_path, names=['Date', 'GDPC1'],
-                        parse_dates=['Date'], skiprows=1,
-                        na_values=['.', 'na', 'NaN'])
-        usgdp_df = usgdp_df.append(usgdp_ann_df, ignore_index=True)
-        usgdp_df = usgdp_df.sort_values(by='Date')
-        usgdp_df = usgdp_df.reset_index(drop=True)
-        # Add other months to annual data 1919-01-01 to 1938-12-01 and fill in
-        # artificial employment data by cubic spline interpolation
+        filename_basic = os.path.join(data_dir,
+                                      'usgdp_' + end_date_str2 + '.csv')
+        # Merge in the U.S. annual real GDP data and add the other quarters
+        # 1929-10-01 to 1946-10-01 to the annual data in one concatenation,
+        # keeping the annual value on the quarters that have one. Then fill in
+        # artificial GDP data by cubic spline interpolation
         quarters_df = \
             pd.DataFrame(pd.date_range('1929-07-01', '1946-10-01', freq='QS'),
                          columns=['Date'])
-        usgdp_df = pd.merge(usgdp_df, quarters_df, left_on='Date',
-                            right_on='Date', how='outer')
-        usgdp_df = usgdp_df.sort_values(by='Date')
-        usgdp_df = usgdp_df.reset_index(drop=True)
-        usgdp_df['GDPC1'].iloc[:71] = \
-            usgdp_df['GDPC1'].iloc[:71].interpolate(method='cubic')
+        usgdp_df = (pd.concat([usgdp_df, usgdp_ann_df, quarters_df],
+                              ignore_index=True, sort=False)
+                    .drop_duplicates(subset='Date')
+                    .sort_values(by='Date')
+                    .reset_index(drop=True))
+        # Assign the filled values by position in one step rather than by
+        # chained indexing, which may write to a copy
+        gdpc1_col = usgdp_df.columns.get_loc('GDPC1')
+        usgdp_df.iloc[:71, gdpc1_col] = \
+            fill_cubic_spline(usgdp_df.iloc[:71, gdpc1_col].to_numpy())
         usgdp_df.to_csv(filename_basic, index=False)
+        # Keep the .parquet version of the file in sync with the .csv file
+        usgdp_df.to_parquet(os.path.splitext(filename_basic)[0] + '.parquet',
+                            index=False)
+        # Log this download and forget the memoized local data, which may
+        # have been read from the files just rewritten
+        downloads[end_date_str] = [today_str, end_date_str2]
+        with open(downloads_path, 'w') as file:
+            json.dump(downloads, file, indent=2, sort_keys=True)
+        _get_usgdp_data_local.cache_clear()
     else:
         # Import the data as pandas DataFrame
-        end_date_str2 = end_date_str
-        data_file_path = os.path.join(cur_path, filename_basic)
-        usgdp_df = pd.read_csv(data_file_path, names=['Date', 'GDPC1'],
-                                parse_dates=['Date'], skiprows=1,
-                                na_values=['.', 'na', 'NaN'])
+        usgdp_df = read_usgdp_file(
+            os.path.join(data_dir, 'usgdp_' + end_date_str2 + '.csv'))
         usgdp_df = usgdp_df.dropna()
+    end_date = dt.datetime.strptime(end_date_str2, '%Y-%m-%d')
+    filename_full = os.path.join(data_dir,
+                                 'usgdp_pk_' + end_date_str2 + '.parquet')
 
     print('End date of U.S. real GDP series is',
           end_date.strftime('%Y-%m-%d'))
 
-    # Set recession-specific parameters
-    rec_label_yr_lst = \
-        ['1929-1933',  # (Aug 1929 - Mar 1933) Great Depression
-         '1937-1938',  # (May 1937 - Jun 1938)
-         '1945',       # (Feb 1945 - Oct 1945)
-         '1948-1949',  # (Nov 1948 - Oct 1949)
-         '1953-1954',  # (Jul 1953 - May 1954)
-         '1957-1958',  # (Aug 1957 - Apr 1958)
-         '1960-1961',  # (Apr 1960 - Feb 1961)
-         '1969-1970',  # (Dec 1969 - Nov 1970)
-         '1973-1975',  # (Nov 1973 - Mar 1975)
-         '1980',       # (Jan 1980 - Jul 1980)
-         '1981-1982',  # (Jul 1981 - Nov 1982)
-         '1990-1991',  # (Jul 1990 - Mar 1991)
-         '2001',       # (Mar 2001 - Nov 2001)
-         '2007-2009',  # (Dec 2007 - Jun 2009) Great Recession
-         '2020-pres']  # (Feb 2020 - present) Coronavirus recession
-
-    rec_label_yrmth_lst = ['Aug 1929 - Mar 1933',  # Great Depression
-                           'May 1937 - Jun 1938',
-                           'Feb 1945 - Oct 1945',
-                           'Nov 1948 - Oct 1949',
-                           'Jul 1953 - May 1954',
-                           'Aug 1957 - Apr 1958',
-                           'Apr 1960 - Feb 1961',
-                           'Dec 1969 - Nov 1970',
-                           'Nov 1973 - Mar 1975',
-                           'Jan 1980 - Jul 1980',
-                           'Jul 1981 - Nov 1982',
-                           'Jul 1990 - Mar 1991',
-                           'Mar 2001 - Nov 2001',
-                           'Dec 2007 - Jun 2009',  # Great Recession
-                           'Feb 2020 - present']  # Coronavirus recess'n
-
-    rec_beg_yrmth_lst = ['Aug 1929', 'May 1937', 'Feb 1945', 'Nov 1948',
-                         'Jul 1953', 'Aug 1957', 'Apr 1960', 'Dec 1969',
-                         'Nov 1973', 'Jan 1980', 'Jul 1981', 'Jul 1990',
-                         'Mar 2001', 'Dec 2007', 'Feb 2020']
-
-    maxdate_rng_lst = [('1929-7-1', '1929-10-1'),
-                       ('1937-4-1', '1937-10-1'),
-                       ('1945-1-1', '1945-4-1'),
-                       ('1948-7-1', '1949-1-1'),
-                       ('1953-4-1', '1953-7-1'),
-                       ('1957-7-1', '1957-10-1'),
-                       ('1960-1-1', '1960-4-1'),
-                       ('1969-7-1', '1970-1-1'),
-                       ('1973-10-1', '1974-1-1'),
-                       ('1979-10-1', '1980-4-1'),
-                       ('1981-4-1', '1981-10-1'),
-                       ('1990-4-1', '1991-10-1'),
-                       ('2001-1-1', '2001-7-1'),
-                       ('2007-7-1', '2008-1-1'),
-                       ('2019-10-1', '2020-4-1')]
-
-    # Create normalized peak series for each recession
-    usgdp_pk = \
-        pd.DataFrame(np.arange(-bkwd_qtrs_max, frwd_qtrs_max + 1, dtype=int),
-                     columns=['qtrs_frm_peak'])
-    usgdp_pk_long = usgdp_df.copy()
+    # Identify each recession's peak real GDP value and its latest peak quarter
+    usgdp_ser = usgdp_df.set_index('Date')['GDPC1']
     peak_vals = []
-    peak_dates = []
-    for i, maxdate_rng in enumerate(maxdate_rng_lst):
-        # Identify peak real GDP value within one quarter of beginning moth of
-        # the recession
-        peak_val = \
-            usgdp_df['GDPC1'][(usgdp_df['Date'] >= maxdate_rng[0]) &
-                                (usgdp_df['Date'] <= maxdate_rng[1])].max()
-        peak_vals.append(peak_val)
-        usgdp_dv_pk_name = 'usgdp_dv_pk' + str(i)
-        usgdp_pk_long[usgdp_dv_pk_name] = usgdp_pk_long['GDPC1'] / peak_val
-        # Identify date of peak real GDP value within one quarter of the
-        # beginning month of the recession
-        peak_date = \
-            usgdp_df['Date'][(usgdp_df['Date'] >= maxdate_rng[0]) &
-                              (usgdp_df['Date'] <= maxdate_rng[1]) &
-                              (usgdp_df['GDPC1'] == peak_val)].max()
-        peak_dates.append(peak_date.strftime('%Y-%m-%d'))
-        qtrs_frm_pk_name = 'qtrs_frm_pk' + str(i)
-        usgdp_pk_long[qtrs_frm_pk_name] = \
-            ((usgdp_pk_long['Date'].dt.year - peak_date.year) * 4 +
-             ((usgdp_pk_long['Date'].dt.month - peak_date.month) / 3))
-        # usempl_pk_long[mths_frm_pk_name] = (usempl_pk_long['Date'] -
-        #                                     peak_date).dt.years
+    peak_timestamps = []
+    for maxdate_rng in _MAXDATE_RNG_TS:
+        rng_gdpc1 = usgdp_ser.loc[maxdate_rng[0]:maxdate_rng[1]].iloc[::-1]
+        peak_date = rng_gdpc1.idxmax()
+        peak_vals.append(rng_gdpc1[peak_date])
+        peak_timestamps.append(peak_date)
+    peak_dates = [peak_date.strftime('%Y-%m-%d')
+                  for peak_date in peak_timestamps]
+    peak_qtr_nums = (pd.DatetimeIndex(peak_timestamps).to_numpy()
+                     .astype('datetime64[M]').astype(int) // 3)
+    for i, peak_val in enumerate(peak_vals):
         print('peak_val ' + str(i) + ' is', peak_val, 'on quarter',
-              peak_date.strftime('%Y-%m-%d'), '(Beg. rec. month:',
-              rec_beg_yrmth_lst[i], ')')
-        # I need to merge the data into this new usgdp_pk DataFrame so that
-        # qtrs_frm_peak variable is shared across the dataframe
-        usgdp_pk = \
-            pd.merge(usgdp_pk,
-                     usgdp_pk_long[[qtrs_frm_pk_name, 'Date', 'GDPC1',
-                                    usgdp_dv_pk_name]],
-                     left_on='qtrs_frm_peak', right_on=qtrs_frm_pk_name,
-                     how='left')
-        usgdp_pk.drop(columns=[qtrs_frm_pk_name], inplace=True)
-        usgdp_pk.rename(
-            columns={'Date': f'Date{i}', 'GDPC1': f'GDPC1{i}'}, inplace=True)
-
-    usgdp_pk.to_csv(filename_full, index=False)
-
-    return (usgdp_pk, end_date_str2, peak_vals, peak_dates, rec_label_yr_lst,
-            rec_label_yrmth_lst, rec_beg_yrmth_lst, maxdate_rng_lst)
+              peak_dates[i], '(Beg. rec. month:', _REC_BEG_YRMTH[i], ')')
+
+    # Create normalized peak series for all the recessions by quarter number
+    qtrs_frm_peak = np.arange(-bkwd_qtrs_max, frwd_qtrs_max + 1, dtype=int)
+    dates = usgdp_df['Date'].to_numpy()
+    qtr_nums = pd.Index(dates.astype('datetime64[M]').astype(int) // 3)
+    target_qtr_nums = (peak_qtr_nums[np.newaxis, :] +
+                       qtrs_frm_peak[:, np.newaxis])
+    rows = qtr_nums.get_indexer(
+        target_qtr_nums.ravel()).reshape(target_qtr_nums.shape)
+    rows_found = rows >= 0
+    date_mat = np.where(rows_found,
+                        np.take(dates, rows),
+                        np.datetime64('NaT'))
+    gdpc1_mat = np.where(rows_found,
+                         np.take(usgdp_df['GDPC1'].to_numpy(), rows), np.nan)
+    usgdp_dv_pk_mat = gdpc1_mat / np.array(peak_vals)[np.newaxis, :]
+
+    # Put the arrays into one DataFrame in which the qtrs_frm_peak variable is
+    # shared across the recessions
+    usgdp_pk_dict = {'qtrs_frm_peak': qtrs_frm_peak}
+    for i in range(len(peak_vals)):
+        usgdp_pk_dict[f'Date{i}'] = date_mat[:, i]
+        usgdp_pk_dict[f'GDPC1{i}'] = gdpc1_mat[:, i]
+        usgdp_pk_dict[f'usgdp_dv_pk{i}'] = usgdp_dv_pk_mat[:, i]
+    usgdp_pk = pd.DataFrame(usgdp_pk_dict)
+
+    # Save usgdp_pk to file with a hash of its data in the file's metadata,
+    # unless the file already holds data with the same hash. Parquet keeps the
+    # column types, so the Date{i} columns need no parsing when the file is
+    # read back in
+    usgdp_pk_hash = hashlib.blake2b(
+        pd.util.hash_pandas_object(usgdp_pk, index=False).to_numpy().tobytes(),
+        digest_size=16).hexdigest().encode()
+    saved_hash = None
+    if os.path.isfile(filename_full):
+        saved_hash = (pq.read_metadata(filename_full).metadata or
+                      {}).get(b'usgdp_pk_hash')
+    if saved_hash != usgdp_pk_hash:
+        usgdp_pk_table = pa.Table.from_pandas(usgdp_pk, preserve_index=False)
+        usgdp_pk_table = usgdp_pk_table.replace_schema_metadata(
+            {**usgdp_pk_table.schema.metadata,
+             b'usgdp_pk_hash': usgdp_pk_hash})
+        pq.write_table(usgdp_pk_table, filename_full)
+
+    return (usgdp_pk, end_date_str2, peak_vals, peak_dates, _REC_LABEL_YR,
+            _REC_LABEL_YRMTH, _REC_BEG_YRMTH, _MAXDATE_RNG)
+
+
+def fill_cubic_spline(vals):
+    '''
+    This function fills in the missing values between the first and last
+    nonmissing values of an evenly spaced series by cubic spline
+    interpolation with not-a-knot end conditions, which is the same spline
+    as pandas interpolate(method='cubic'). It solves the tridiagonal system
+    for the second derivatives of the spline at the knots directly with the
+    Thomas algorithm.
+
+    Args:
+        vals (array_like): length-N series with missing values as NaN and at
+            least four nonmissing values
+
+    Other functions and files called by this function:
+        None
+
+    Files created by this function:
+        None
+
+    Returns:
+        filled (array): length-N series with the missing values between the
+            first and last nonmissing values filled in
+    '''
+    filled = np.array(vals, dtype=float)
+    x = np.flatnonzero(~np.isnan(filled))
+    y = filled[x]
+    n = len(x)
+    h = np.diff(x).astype(float)
+    slopes = np.diff(y) / h
+
+    # Tridiagonal system for the second derivatives M[1:-1] at the interior
+    # knots, with sub-diagonal a, diagonal b, super-diagonal c, and right-hand
+    # side d
+    a = h[:-1].copy()
+    b = 2 * (h[:-1] + h[1:])
+    c = h[1:].copy()
+    d = 6 * np.diff(slopes)
+    # Not-a-knot end conditions make the third derivative continuous at the
+    # second and second-to-last knots, which expresses M[0] and M[-1] in
+    # terms of their two interior neighbors
+    b[0] = 3 * h[0] + 2 * h[1] + h[0] ** 2 / h[1]
+    c[0] = h[1] - h[0] ** 2 / h[1]
+    b[-1] = 3 * h[-1] + 2 * h[-2] + h[-1] ** 2 / h[-2]
+    a[-1] = h[-2] - h[-1] ** 2 / h[-2]
+
+    # Thomas algorithm: forward elimination, then back substitution
+    for i in range(1, n - 2):
+        w = a[i] / b[i - 1]
+        b[i] -= w * c[i - 1]
+        d[i] -= w * d[i - 1]
+    m = np.zeros(n)
+    m[n - 2] = d[-1] / b[-1]
+    for i in range(n - 4, -1, -1):
+        m[i + 1] = (d[i] - c[i] * m[i + 2]) / b[i]
+    m[0] = m[1] + h[0] / h[1] * (m[1] - m[2])
+    m[-1] = m[-2] + h[-1] / h[-2] * (m[-2] - m[-3])
+
+    # Evaluate the spline on the interval of each missing value
+    x_miss = np.flatnonzero(np.isnan(filled))
+    x_miss = x_miss[(x_miss > x[0]) & (x_miss < x[-1])]
+    j = np.searchsorted(x, x_miss) - 1
+    t_lo = x_miss - x[j]
+    t_hi = x[j + 1] - x_miss
+    filled[x_miss] = ((m[j] * t_hi ** 3 + m[j + 1] * t_lo ** 3) / (6 * h[j]) +
+                      (y[j] / h[j] - m[j] * h[j] / 6) * t_hi +
+                      (y[j + 1] / h[j] - m[j + 1] * h[j] / 6) * t_lo)
+
+    return filled
+
+
+@functools.lru_cache(maxsize=8)
+def _get_usgdp_data_local(frwd_qtrs_max, bkwd_qtrs_max, end_date_str):
+    '''
+    This function memoizes get_usgdp_data() with download_from_internet=False
+    so that repeated plots of the same local data file do not read and
+    reorganize the file again. Callers must not modify the returned objects.
+    '''
+    return get_usgdp_data(frwd_qtrs_max, bkwd_qtrs_max, end_date_str,
+                          download_from_internet=False)
 
 
 def usgdp_npp(frwd_qtrs_main=10, bkwd_qtrs_main=3, frwd_qtrs_max=40,
               bkwd_qtrs_max=12, usgdp_end_date='today',
-               download_from_internet=True, html_show=True):
+              download_from_internet=True, html_show=True, precomputed=None,
+              test_mode=False):
     '''
     This function creates the HTML and JavaScript code for the dynamic
     visualization of the normalized peak plot of the last 15 recessions in the
@@ -271,15 +481,30 @@ def usgdp_npp(frwd_qtrs_main=10, bkwd_qtrs_main=3, frwd_qtrs_max=40,
             from local directory
         html_show (bool): =True if open dynamic visualization in browser once
             created
+        precomputed (tuple or None): output tuple of get_usgdp_data() to use
+            instead of calling get_usgdp_data() again, or None to get the
+            data
+        test_mode (bool): =True if only build the figure object as cheaply as
+            possible, with the WebGL output backend, no hover tooltips, and
+            no HTML file output or display
 
     Other functions and files called by this function:
-        get_usgdp_data()
+        get_usgdp_data() (unless precomputed is given), through
+            _get_usgdp_data_local() if download_from_internet=False
 
     Files created by this function:
-       images/usgdp_[yyyy-mm-dd].html
+       images/usgdp_[yyyy-mm-dd].html, which loads BokehJS from the Bokeh CDN
+           rather than inlining it, so it is small but needs an internet
+           connection to display
 
     Returns: fig, end_date_str
     '''
+    from bokeh.io import output_file
+    from bokeh.plotting import figure, show
+    from bokeh.models import ColumnDataSource, Title, Legend, HoverTool
+    # from bokeh.models import Label
+    from bokeh.palettes import Category20
+
     # Create directory if images directory does not already exist
     cur_path = os.path.split(os.path.abspath(__file__))[0]
     image_fldr = 'images'
@@ -300,56 +525,58 @@ def usgdp_npp(frwd_qtrs_main=10, bkwd_qtrs_main=3, frwd_qtrs_max=40,
     frwd_qtrs_max = int(frwd_qtrs_max)
     bkwd_qtrs_max = int(bkwd_qtrs_max)
 
+    if precomputed is None and download_from_internet:
+        precomputed = get_usgdp_data(frwd_qtrs_max, bkwd_qtrs_max,
+                                     end_date_str, download_from_internet)
+    elif precomputed is None:
+        precomputed = _get_usgdp_data_local(frwd_qtrs_max, bkwd_qtrs_max,
+                                            end_date_str)
     (usgdp_pk, end_date_str2, peak_vals, peak_dates, rec_label_yr_lst,
-        rec_label_yrmth_lst, rec_beg_yrmth_lst, maxdate_rng_lst) = \
-        get_usgdp_data(frwd_qtrs_max, bkwd_qtrs_max, end_date_str,
-                       download_from_internet)
+        rec_label_yrmth_lst, rec_beg_yrmth_lst, maxdate_rng_lst) = precomputed
     if end_date_str2 != end_date_str:
         print('GDPC1 data downloaded on ' + end_date_str + ' has most ' +
               'recent GDPC1 data quarter of ' + end_date_str2 + '.')
     end_date2 = dt.datetime.strptime(end_date_str2, '%Y-%m-%d')
 
-    rec_cds_list = []
-    min_main_val_lst = []
-    max_main_val_lst = []
+    # Put all 15 recessions in one ColumnDataSource, with float32 usgdp_dv_pk
+    usgdp_pk_cds_data = {col: usgdp_pk[col].to_numpy()
+                         for col in usgdp_pk.columns}
     for i in range(15):
-        usgdp_pk_rec = \
-            usgdp_pk[['qtrs_frm_peak', f'Date{i}', f'GDPC1{i}',
-                      f'usgdp_dv_pk{i}']].dropna()
-        usgdp_pk_rec.rename(
-            columns={f'Date{i}': 'Date', f'GDPC1{i}': 'GDPC1',
-                     f'usgdp_dv_pk{i}': 'usgdp_dv_pk'}, inplace=True)
-        rec_cds_list.append(ColumnDataSource(usgdp_pk_rec))
-        # Find minimum and maximum usgdp_dv_pk values as inputs to main plot
-        # frame size
-        min_main_val_lst.append(
-            usgdp_pk_rec['usgdp_dv_pk'][
-                (usgdp_pk_rec['qtrs_frm_peak'] >= -bkwd_qtrs_main) &
-                (usgdp_pk_rec['qtrs_frm_peak'] <= frwd_qtrs_main)].min())
-        max_main_val_lst.append(
-            usgdp_pk_rec['usgdp_dv_pk'][
-                (usgdp_pk_rec['qtrs_frm_peak'] >= -bkwd_qtrs_main) &
-                (usgdp_pk_rec['qtrs_frm_peak'] <= frwd_qtrs_main)].max())
+        usgdp_pk_cds_data[f'usgdp_dv_pk{i}'] = \
+            usgdp_pk_cds_data[f'usgdp_dv_pk{i}'].astype(np.float32)
+    usgdp_pk_cds = ColumnDataSource(usgdp_pk_cds_data)
+
+    # Find minimum and maximum usgdp_dv_pk values in the main display window
+    qtrs_frm_peak = usgdp_pk['qtrs_frm_peak'].to_numpy()
+    main_slice = slice(*np.searchsorted(qtrs_frm_peak,
+                                        [-bkwd_qtrs_main, frwd_qtrs_main + 1]))
+    usgdp_dv_pk_mat = \
+        usgdp_pk[[f'usgdp_dv_pk{i}' for i in range(15)]].to_numpy()
+    min_main_val = float(np.nanmin(usgdp_dv_pk_mat[main_slice]))
+    max_main_val = float(np.nanmax(usgdp_dv_pk_mat[main_slice]))
 
     # Create Bokeh plot of GDPC1 normalized peak plot figure
     fig_title = 'Progression of GCPC1 in last 15 recessions'
     filename = ('images/usgdp_npp_' + end_date_str2 + '.html')
-    output_file(filename, title=fig_title)
-
-    # Format the tooltip
-    tooltips = [('Date', '@Date{%F}'),
-                ('Quarters from peak', '$x{0.}'),
-                ('Real GDP', '$@GDPC1{0,0.}B'),
-                ('Fraction of peak', '@usgdp_dv_pk{0.0 %}')]
-
-    # Solve for minimum and maximum GDPC1/Peak values in quarterly main display
-    # window in order to set the appropriate xrange and yrange
-    min_main_val = min(min_main_val_lst)
-    max_main_val = max(max_main_val_lst)
-
+    if not test_mode:
+        output_file(filename, title=fig_title, mode='cdn')
+
+    # Format the tooltips, one for the columns of each recession
+    tooltips_lst = [[('Date', f'@Date{i}{{%F}}'),
+                     ('Quarters from peak', '$x{0.}'),
+                     ('Real GDP', f'$@GDPC1{i}{{0,0.}}B'),
+                     ('Fraction of peak', f'@usgdp_dv_pk{i}{{0.0 %}}')]
+                    for i in range(15)]
+
+    # Set the appropriate xrange and yrange from the minimum and maximum
+    # GDPC1/Peak values in the quarterly main display window
     datarange_main_vals = max_main_val - min_main_val
     datarange_main_qtrs = int(frwd_qtrs_main + bkwd_qtrs_main)
     fig_buffer_pct = 0.10
+    fig_tools = ['save', 'zoom_in', 'zoom_out', 'box_zoom', 'pan', 'undo',
+                 'redo', 'reset', 'hover', 'help']
+    if test_mode:
+        fig_tools.remove('hover')
     fig = figure(plot_height=500,
                  plot_width=800,
                  x_axis_label='Quarters from Peak',
@@ -360,55 +587,20 @@ def usgdp_npp(frwd_qtrs_main=10, bkwd_qtrs_main=3, frwd_qtrs_max=40,
                            fig_buffer_pct * datarange_main_qtrs),
                           (frwd_qtrs_main +
                            fig_buffer_pct * datarange_main_qtrs)),
-                 tools=['save', 'zoom_in', 'zoom_out', 'box_zoom',
-                        'pan', 'undo', 'redo', 'reset', 'hover', 'help'],
-                 toolbar_location='left')
+                 tools=fig_tools,
+                 toolbar_location='left',
+                 output_backend='webgl' if test_mode else 'canvas')
     fig.title.text_font_size = '18pt'
     fig.toolbar.logo = None
-    l0 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk', source=rec_cds_list[0],
-                  color='blue', line_width=5, alpha=0.7, muted_alpha=0.15)
-    l1 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk', source=rec_cds_list[1],
-                  color=Category20[13][0], line_width=2, alpha=0.7,
-                  muted_alpha=0.15)
-    l2 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk', source=rec_cds_list[2],
-                  color=Category20[13][1], line_width=2, alpha=0.7,
-                  muted_alpha=0.15)
-    l3 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk', source=rec_cds_list[3],
-                  color=Category20[13][2], line_width=2,
-                  alpha=0.7, muted_alpha=0.15)
-    l4 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk', source=rec_cds_list[4],
-                  color=Category20[13][3], line_width=2, alpha=0.7,
-                  muted_alpha=0.15)
-    l5 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk', source=rec_cds_list[5],
-                  color=Category20[13][4], line_width=2, alpha=0.7,
-                  muted_alpha=0.15)
-    l6 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk', source=rec_cds_list[6],
-                  color=Category20[13][5], line_width=2, alpha=0.7,
-                  muted_alpha=0.15)
-    l7 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk', source=rec_cds_list[7],
-                  color=Category20[13][6], line_width=2, alpha=0.7,
-                  muted_alpha=0.15)
-    l8 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk', source=rec_cds_list[8],
-                  color=Category20[13][7], line_width=2, alpha=0.7,
-                  muted_alpha=0.15)
-    l9 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk', source=rec_cds_list[9],
-                  color=Category20[13][8], line_width=2, alpha=0.7,
-                  muted_alpha=0.15)
-    l10 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk',
-                   source=rec_cds_list[10], color=Category20[13][9],
-                   line_width=2, alpha=0.7, muted_alpha=0.15)
-    l11 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk',
-                   source=rec_cds_list[11], color=Category20[13][10],
-                   line_width=2, alpha=0.7, muted_alpha=0.15)
-    l12 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk',
-                   source=rec_cds_list[12], color=Category20[13][11],
-                   line_width=2, alpha=0.7, muted_alpha=0.15)
-    l13 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk',
-                   source=rec_cds_list[13], color=Category20[13][12],
-                   line_width=2, alpha=0.7, muted_alpha=0.15)
-    l14 = fig.line(x='qtrs_frm_peak', y='usgdp_dv_pk',
-                   source=rec_cds_list[14], color='black', line_width=5,
-                   alpha=0.7, muted_alpha=0.15)
+    # Plot one line for each recession, with thick lines for the Great
+    # Depression and the current recession
+    rec_colors = ['blue'] + list(Category20[13]) + ['black']
+    rec_line_widths = [5] + [2] * 13 + [5]
+    rec_lines = [fig.line(x='qtrs_frm_peak', y=f'usgdp_dv_pk{i}',
+                          source=usgdp_pk_cds, color=rec_colors[i],
+                          line_width=rec_line_widths[i], alpha=0.7,
+                          muted_alpha=0.15)
+                 for i in range(15)]
 
     # Dashed vertical line at the peak PAYEMS value period
     fig.line(x=[0.0, 0.0], y=[-0.5, 2.4], color='black', line_width=2,
@@ -438,21 +630,8 @@ def usgdp_npp(frwd_qtrs_main=10, bkwd_qtrs_main=3, frwd_qtrs_max=40,
     # fig.xaxis.major_label_overrides = major_tick_dict
 
     # Add legend
-    legend = Legend(items=[(rec_label_yrmth_lst[0], [l0]),
-                           (rec_label_yrmth_lst[1], [l1]),
-                           (rec_label_yrmth_lst[2], [l2]),
-                           (rec_label_yrmth_lst[3], [l3]),
-                           (rec_label_yrmth_lst[4], [l4]),
-                           (rec_label_yrmth_lst[5], [l5]),
-                           (rec_label_yrmth_lst[6], [l6]),
-                           (rec_label_yrmth_lst[7], [l7]),
-                           (rec_label_yrmth_lst[8], [l8]),
-                           (rec_label_yrmth_lst[9], [l9]),
-                           (rec_label_yrmth_lst[10], [l10]),
-                           (rec_label_yrmth_lst[11], [l11]),
-                           (rec_label_yrmth_lst[12], [l12]),
-                           (rec_label_yrmth_lst[13], [l13]),
-                           (rec_label_yrmth_lst[14], [l14])],
+    legend = Legend(items=[(rec_label, [rec_line]) for rec_label, rec_line
+                           in zip(rec_label_yrmth_lst, rec_lines)],
                     location='center')
     fig.add_layout(legend, 'right')
 
@@ -489,11 +668,16 @@ def usgdp_npp(frwd_qtrs_main=10, bkwd_qtrs_main=3, frwd_qtrs_max=40,
                    'below')
     fig.legend.click_policy = 'mute'
 
-    # Add the HoverTool to the figure
-    fig.add_tools(HoverTool(tooltips=tooltips, toggleable=False,
-                            formatters={'@Date': 'datetime'}))
+    # Add a HoverTool for each recession's line to the figure, because each
+    # line's tooltips reference that recession's columns
+    if not test_mode:
+        for i, rec_line in enumerate(rec_lines):
+            fig.add_tools(HoverTool(renderers=[rec_line],
+                                    tooltips=tooltips_lst[i],
+                                    toggleable=False,
+                                    formatters={f'@Date{i}': 'datetime'}))
 
-    if html_show:
+    if html_show and not test_mode:
         show(fig)
 
     return fig, end_date_str